@@ -1,5 +1,10 @@
+import os
+import tempfile
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from numpy import pi
 from objects import functions, plotters, runners, transforms
+from pathlib import Path
 
 
 xy_ranges = [
@@ -68,6 +73,22 @@ basis_vectors = [
 
 output_element = 2
 
+# The plotter used by each video-rendering worker process, see init_render_worker
+render_plotter:plotters.FunctionPlotter = None
+
+
+def init_render_worker(input_file:str, color_scheme:str):
+	# Load the surface data once per worker process, every video rendered by that process then reuses it
+	global render_plotter
+	render_plotter = plotters.FunctionPlotter(input_file=input_file, color_scheme=color_scheme)
+
+
+def render_video(elevation:int, azimuth:int):
+	# write_video turns every image in the plotter's image directory into a video frame, so each video gets its own temporary image directory
+	with tempfile.TemporaryDirectory() as image_directory:
+		render_plotter.image_output_path = Path(image_directory)
+		render_plotter.write_video(True, output_element, None, f"{video_file_directory}/cubic_{str(elevation).zfill(2)}_{str(azimuth).zfill(2)}.mp4", elevation, -azimuth,  -45, 30)
+
 
 def main():
 	# Main function for this script
@@ -87,10 +108,12 @@ def main():
 	# If desired, un-comment this code bloc to generate a group of transform animations shown from various angles
 	'''
 	'''
-	fp = plotters.FunctionPlotter(input_file=data_file, color_scheme="rainbow")
-	for elevation in range(0, 91, 5):
-		for azimuth in range(0, 91, 5):
-			fp.write_video(True, output_element, None, f"{video_file_directory}/cubic_{str(elevation).zfill(2)}_{str(azimuth).zfill(2)}.mp4", elevation, -azimuth,  -45, 30)
+	# Every video is independent of the others, so they are rendered in parallel, one worker process per CPU
+	with ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=init_render_worker, initargs=(data_file, "rainbow")) as executor:
+		futures = [executor.submit(render_video, elevation, azimuth) for elevation in range(0, 91, 5) for azimuth in range(0, 91, 5)]
+		for future in as_completed(futures):
+			# Raise any exception from a worker here instead of losing it
+			future.result()
 
 
 if (__name__ == "__main__"):
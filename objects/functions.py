@@ -2,6 +2,13 @@ import numpy as np
 
 from typing import Dict, List, Tuple, Union
 
+try:
+	from objects.mandelbrot_kernel import escape_time
+except ImportError:
+	# numba is not installed, the mandelbrot function objects will use numpy_escape_time instead
+	escape_time = None
+
+
 def generate_orthonormal_bases(basis:List[List[Union[int, float]]], rotate_basis:Dict[str, Union[int, float, List[int]]], return_vector_set:bool=False) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
 	"""
 	This function starts with an initial basis and then generates a rotated set of orthonormal bases according to the other incoming parameter
@@ -27,14 +34,14 @@ def generate_orthonormal_bases(basis:List[List[Union[int, float]]], rotate_basis
 	np.ndarray :The computed set of orthonormal bases
 	"""
 
-	# Initialize a set of segments + 1 copies of the initial incoming basis vectors, these will be rotated as per the parameters in the rotate_basis argument
+	# Only the vector being rotated differs from one basis to the next, so the initial basis is kept as a single copy until the full set is needed
 	# x segments need x+1 endpoints
 	n = rotate_basis["segments"] + 1
-	vector_set = np.repeat(np.array(basis).T[ : , : , np.newaxis], n, axis=2).astype(float)
+	initial_basis = np.array(basis, dtype=float).T
 
 	# Initialize the set of transforms with all zeros and then set the relevant values to one for the rotating vector's elements that are not being transformed
-	transforms = np.zeros(vector_set.shape)
-	for i in range(vector_set.shape[1]):
+	transforms = np.zeros((*initial_basis.shape, n))
+	for i in range(initial_basis.shape[1]):
 		if (i not in rotate_basis["rotate_elements"]):
 			transforms[i, i] = np.ones(n)
 
@@ -45,18 +52,91 @@ def generate_orthonormal_bases(basis:List[List[Union[int, float]]], rotate_basis
 	transforms[rotate_basis["rotate_elements"][1], rotate_basis["rotate_elements"][0]] = np.sin(angles)
 	transforms[rotate_basis["rotate_elements"][1], rotate_basis["rotate_elements"][1]] = np.cos(angles)
 
-	# Iterate through the initialized set of basis vectors and apply the generated transforms to the vector being rotated
-	for i in range(transforms.shape[2]):
-		vector_set[ : , rotate_basis["rotate_vector"], i] = transforms[ : , : , i] @ vector_set[ : , rotate_basis["rotate_vector"], i]
+	# Apply the generated transforms to the initial copy of the vector being rotated, giving that vector for every segment with a single contraction
+	rotated_vectors = np.einsum("deS,e->dS", transforms, initial_basis[ : , rotate_basis["rotate_vector"]])
+
+	# Now build the full set of bases in one pass, with the segment axis first as numpy expects for stacked matrices, and drop in the rotated vectors
+	vector_set = np.broadcast_to(initial_basis, (n, *initial_basis.shape)).copy()
+	vector_set[ : , : , rotate_basis["rotate_vector"]] = rotated_vectors.T
 
 	# Convert each basis in the rotated set into an orthonormal basis using Numpy's implementation of the Gramm-Schmidt method
-	orthonormals = np.zeros(vector_set.shape)
-	for i in range(vector_set.shape[2]):
-		orthonormals[ : , : , i], r = np.linalg.qr(vector_set[ : , : , i])
+	# The QR decomposition is run once on the whole stack of bases
+	orthonormals, r = np.linalg.qr(vector_set)
+	orthonormals = np.moveaxis(orthonormals, 0, -1)
+	vector_set = np.moveaxis(vector_set, 0, -1)
 
 	return orthonormals if (not return_vector_set) else (orthonormals, vector_set)
 
 
+def numpy_escape_time(re:np.ndarray, im:np.ndarray, bailout:Union[int, float], iterations_max:int, zero_escaped:bool=False) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+	This function is the pure numpy version of the mandelbrot escape-time iteration, it is used when numba is not installed
+	The real and imaginary portions are kept as two separate real arrays instead of one complex array so that each step is a handful of simple real operations
+
+	Parameters
+	----------
+	re : np.ndarray
+		The real portion of the incoming complex numbers
+	im : np.ndarray
+		The imaginary portion of the incoming complex numbers, this must be the same shape as re
+	bailout : Union[int, float]
+		The magnitude at which a point is considered to have escaped
+	iterations_max : int
+		The maximum number of iterations run on each point
+	zero_escaped : bool, default False
+		A boolean flag to indicate whether points that have escaped should be set to zero instead of being left at the value where they escaped
+
+	Returns
+	-------
+	Tuple[np.ndarray, np.ndarray] : The real and imaginary portions of the iterated points, in the same shape as the incoming arrays
+	"""
+
+	zr_out = np.zeros_like(np.asarray(re))
+	zi_out = np.zeros_like(np.asarray(im))
+
+	# Only the points that have not escaped yet are iterated, each one is tracked by its position in the flattened output arrays
+	index = np.arange(zr_out.size)
+	cr = np.ravel(re)
+	ci = np.ravel(im)
+	zr = np.zeros_like(cr)
+	zi = np.zeros_like(ci)
+
+	# Compare the squared magnitude against the squared bailout to avoid taking a square root on every iteration
+	b2 = bailout * bailout
+	for i in range(iterations_max):
+		active = ((zr * zr) + (zi * zi)) < b2
+		if (not active.all()):
+			# Some points have just escaped, save the values where they escaped (or leave them at zero) and drop them from the set being iterated
+			if (not zero_escaped):
+				escaped = ~active
+				zr_out.flat[index[escaped]] = zr[escaped]
+				zi_out.flat[index[escaped]] = zi[escaped]
+
+			index = index[active]
+			cr = cr[active]
+			ci = ci[active]
+			zr = zr[active]
+			zi = zi[active]
+
+			if (index.size == 0):
+				# Every point has escaped, there is nothing left to iterate
+				break
+
+		zr, zi = (zr * zr) - (zi * zi) + cr, (2 * zr * zi) + ci
+
+	# Save the points that were still being iterated when the loop ended, any of them that escaped on the final iteration are left at zero if zero_escaped is set
+	if (zero_escaped):
+		active = ((zr * zr) + (zi * zi)) < b2
+		index = index[active]
+		zr = zr[active]
+		zi = zi[active]
+
+	zr_out.flat[index] = zr
+	zi_out.flat[index] = zi
+
+	return (zr_out, zi_out, )
+
+
 def simple_complex_square(*args) -> Tuple[np.array]:
 	"""
 	This function squares a set of complex numbers and returns the results
@@ -87,47 +167,46 @@ def simple_complex_square(*args) -> Tuple[np.array]:
 class mandelbrotWithLastBailout():
 	bailout:Union[int, float] = None
 	iterations_max:int = None
+	dtype:type = None
 
-	def __init__(self, bailout:Union[int, float], iterations_max:int):
+	def __init__(self, bailout:Union[int, float], iterations_max:int, dtype:type=np.float64):
 		self.bailout = bailout
 		self.iterations_max = iterations_max
+		self.dtype = dtype
 
 	def compute(self, *args) -> Tuple[np.array]:
 		result = None
 
 		if (len(args) == 2):
-			args_set = (args[0] + (1j * args[1]))
-			result = np.zeros(args_set.shape)
-
-			for i in range(self.iterations_max):
-				result = np.where((np.abs(result) < self.bailout) == True, (result**2) + args_set, result)
+			# The incoming arrays may be sparse mesh grid coordinates, every point is iterated separately so broadcast them out to the full grid first
+			re, im = np.broadcast_arrays(np.asarray(args[0], dtype=self.dtype), np.asarray(args[1], dtype=self.dtype))
+			compute_escape_time = escape_time if (escape_time is not None) else numpy_escape_time
+			result = compute_escape_time(re, im, self.bailout, self.iterations_max)
 
-		return (np.real(result), np.imag(result), ) if (result is not None) else None
+		return result
 
 
 
 class mandelbrot():
 	bailout:Union[int, float] = None
 	iterations_max:int = None
+	dtype:type = None
 
-	def __init__(self, bailout:Union[int, float], iterations_max:int):
+	def __init__(self, bailout:Union[int, float], iterations_max:int, dtype:type=np.float64):
 		self.bailout = bailout
 		self.iterations_max = iterations_max
+		self.dtype = dtype
 
 	def compute(self, *args) -> Tuple[np.array]:
 		result = None
 
 		if (len(args) == 2):
-			args_set = (args[0] + (1j * args[1]))
-			result = np.zeros(args_set.shape)
+			# The incoming arrays may be sparse mesh grid coordinates, every point is iterated separately so broadcast them out to the full grid first
+			re, im = np.broadcast_arrays(np.asarray(args[0], dtype=self.dtype), np.asarray(args[1], dtype=self.dtype))
+			compute_escape_time = escape_time if (escape_time is not None) else numpy_escape_time
+			result = compute_escape_time(re, im, self.bailout, self.iterations_max, True)
 
-			for i in range(self.iterations_max):
-				result = np.where((np.abs(result) < self.bailout) == True, (result**2) + args_set, result)
-
-		if (result is not None):
-			result = np.where((np.abs(result) >= self.bailout) == True, (0 + 0j), result)
-
-		return (np.real(result), np.imag(result), ) if (result is not None) else None
+		return result
 
 
 class complex_square():
@@ -145,7 +224,8 @@ class complex_square():
 
 		if (len(args) == 2):
 			arg_set = (args[0] + (1j * args[1]))
-			result = (self.a * (arg_set ** 2)) + (self.b * arg_set) + self.c
+			# Evaluate the polynomial in Horner's form to avoid building separate power arrays
+			result = (((self.a * arg_set) + self.b) * arg_set) + self.c
 
 		return (np.real(result), np.imag(result), ) if (result is not None) else None
 
@@ -169,6 +249,7 @@ class complex_cubic():
 
 		if (len(args) == 2):
 			arg_set = (args[0] + (1j * args[1])) - self.offset
-			result = (self.a * (arg_set ** 3)) + (self.b * (arg_set ** 2)) + (self.c * arg_set) + self.d
+			# Evaluate the polynomial in Horner's form to avoid building separate power arrays
+			result = (((((self.a * arg_set) + self.b) * arg_set) + self.c) * arg_set) + self.d
 
 		return (np.real(result), np.imag(result), ) if (result is not None) else None
@@ -0,0 +1,65 @@
+# This library holds the compiled, per-point escape-time kernel used by the mandelbrot function objects
+# It requires numba, the function objects fall back to a pure numpy implementation if numba is not installed
+
+import numpy as np
+
+from numba import njit, prange
+from typing import Tuple, Union
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _escape_time(re:np.ndarray, im:np.ndarray, bailout:float, iterations_max:int, zero_escaped:bool) -> Tuple[np.ndarray, np.ndarray]:
+	# Each point is iterated on its own and stops as soon as it escapes, so no work is done on points that have already escaped
+	# The magnitude is compared in squared form to avoid taking a square root on every iteration
+	re_out = np.empty_like(re)
+	im_out = np.empty_like(im)
+	b2 = bailout * bailout
+
+	# The iterated values are started from the incoming point's own type so that float32 input is iterated in float32
+	for i in prange(re.shape[0]):
+		cr = re[i]
+		ci = im[i]
+		zr = cr - cr
+		zi = ci - ci
+
+		for j in range(iterations_max):
+			if ((zr * zr) + (zi * zi) >= b2):
+				break
+
+			zr, zi = (zr * zr) - (zi * zi) + cr, ((zr + zr) * zi) + ci
+
+		if (zero_escaped and ((zr * zr) + (zi * zi) >= b2)):
+			re_out[i] = 0
+			im_out[i] = 0
+		else:
+			re_out[i] = zr
+			im_out[i] = zi
+
+	return re_out, im_out
+
+
+def escape_time(re:np.ndarray, im:np.ndarray, bailout:Union[int, float], iterations_max:int, zero_escaped:bool=False) -> Tuple[np.ndarray, np.ndarray]:
+	"""
+	This function runs the mandelbrot iteration z = z**2 + c for every point c = re + im*j in the incoming arrays
+	A point stops being iterated as soon as its magnitude reaches the bailout value, leaving it at the value where it escaped
+
+	Parameters
+	----------
+	re : np.ndarray
+		The real portion of the incoming complex numbers
+	im : np.ndarray
+		The imaginary portion of the incoming complex numbers, this must be the same shape as re
+	bailout : Union[int, float]
+		The magnitude at which a point is considered to have escaped
+	iterations_max : int
+		The maximum number of iterations run on each point
+	zero_escaped : bool, default False
+		A boolean flag to indicate whether points that have escaped should be set to zero instead of being left at the value where they escaped
+
+	Returns
+	-------
+	Tuple[np.ndarray, np.ndarray] : The real and imaginary portions of the iterated points, in the same shape as the incoming arrays
+	"""
+
+	re_out, im_out = _escape_time(np.ascontiguousarray(re).ravel(), np.ascontiguousarray(im).ravel(), float(bailout), int(iterations_max), zero_escaped)
+
+	return (re_out.reshape(np.shape(re)), im_out.reshape(np.shape(im)), )
@@ -80,9 +80,18 @@ class FunctionPlotter:
 		with open(self.input_file) as f:
 			json_data:Dict = json.load(f)
 			self.ranges = json_data["ranges"]
-			self.frames = np.array(json_data["frames"])
 
-			if (len(self.frames.shape) >= 2):
+			if ("frames_file" in json_data):
+				# The frames were saved as a binary numpy file alongside the input file, memory-map it so frame data is only read from disk as it is used
+				self.frames = np.load(self.input_file.parent / json_data["frames_file"], mmap_mode="r")
+			else:
+				self.frames = np.array(json_data["frames"])
+
+			if (("minima" in json_data) and ("maxima" in json_data)):
+				# The minima and maxima were recorded when the frames were written, use them instead of reading through every frame
+				self.minima = np.array(json_data["minima"])
+				self.maxima = np.array(json_data["maxima"])
+			elif (len(self.frames.shape) >= 2):
 				self.minima = np.zeros(self.frames.shape[1])
 				self.maxima = np.zeros(self.frames.shape[1])
 
@@ -9,6 +9,12 @@ from pathlib import Path
 from re import split
 from typing import Any, Callable, Dict, List, Tuple, Union
 
+try:
+	import cupy as cp
+except ImportError:
+	# cupy is not installed, animation frames can only be computed on the CPU
+	cp = None
+
 class FunctionRunner:
 	# This class is the first, generic runner for a function
 	# It does not define the function, only a framework for running and transforming the desired function
@@ -19,6 +25,12 @@ class FunctionRunner:
 	default_output_directory:str = "./json/"
 	output_file:Path = Path(f"{default_output_directory}output.json")
 
+	# The animation frames are only used for plots and videos, so by default they are computed in single precision to halve their memory and bandwidth
+	dtype:type = np.float32
+
+	# If set, the animation frames are computed on a CUDA GPU using cupy
+	use_gpu:bool = False
+
 	ranges:List[Dict[str, float]] = None
 	computed_points:Dict = None
 	animation_frames:Dict = None
@@ -31,7 +43,9 @@ class FunctionRunner:
 			The function that will be used by this function runner instance
 		**kwargs : Dict[str, Any]
 			A set of configuration parmeters in parameter name: value format
-			Right now, the only useful configuration parameter is the output file to which computed data would be written
+			Right now, the only useful configuration parameters are the output file to which computed data would be written,
+			the dtype used for the animation frames (np.float32 by default, pass np.float64 for full precision)
+			and use_gpu, a boolean flag to compute the animation frames on a CUDA GPU (this requires cupy to be installed)
 
 		Returns
 		-------
@@ -46,6 +60,15 @@ class FunctionRunner:
 			if (output_file is not None):
 				self.output_file = output_file
 
+		if (("dtype" in kwargs) and (kwargs["dtype"] is not None)):
+			self.dtype = kwargs["dtype"]
+
+		if (("use_gpu" in kwargs) and (kwargs["use_gpu"])):
+			if (cp is None):
+				raise Exception("Computing animation frames on the GPU requires cupy, which is not installed")
+
+			self.use_gpu = True
+
 	def check_file_path(self, file_name:str) -> Path:
 		"""
 		This function checks to make sure a file_name is a valid path
@@ -95,6 +118,7 @@ class FunctionRunner:
 		Returns
 		-------
 		Tuple[np.array] : The generated mesh grid for the incoming ranges
+			The mesh grid is sparse, each coordinate array only spans its own axis and relies on numpy broadcasting to cover the full grid
 		"""
 
 		coordinates = None
@@ -103,7 +127,7 @@ class FunctionRunner:
 			for number_range in ranges:
 				arrays.append(np.linspace(number_range["min"], number_range["max"], number_range["segments"] + 1))
 
-			coordinates = np.meshgrid(*arrays)
+			coordinates = np.meshgrid(*arrays, sparse=True)
 		elif (len(ranges) == 1):
 			# If only one range was passed in return a simple line space instead
 			coordinates = np.linspace(number_range["min"], number_range["max"], number_range["segments"] + 1)
@@ -134,13 +158,14 @@ class FunctionRunner:
 			results:Tuple[np.array] = self.fn(*coordinates) if (callable(self.fn)) else self.fn.compute(*coordinates)
 
 			if (results is not None):
+				# The coordinates come from a sparse mesh grid, so they (and possibly the results) are broadcast out to the full grid only here
 				points_list = list(coordinates)
 				for result in results:
 					points_list.append(result)
 
 				self.computed_points = {
 					"ranges": ranges,
-					"points": np.array(points_list)
+					"points": np.array(np.broadcast_arrays(*points_list))
 				}
 
 	def animate_rotation(self, rotations:Dict, basis_vectors:List[List]=None)->None:
@@ -168,31 +193,32 @@ class FunctionRunner:
 		if ((self.computed_points is not None) and (len(self.computed_points["points"].shape) > 0)):
 			rotators = list()
 			for i, rotation in enumerate(rotations["transforms"]):
-				# Initialize the rotator for this transform
-				rotators.append(np.zeros([len(rotation["transform"]), len(rotation["transform"][0]), rotations["segments"] + 1]))
+				# Initialize the rotator for this transform with all zeros, with the rotation segments (plus one to include all endpoints) as the first axis
+				rotators.append(np.zeros([rotations["segments"] + 1, len(rotation["transform"]), len(rotation["transform"][0])], dtype=self.dtype))
 
-				# Set a line of angles for this rotation and then iterate over every row and row element in the transform to build this rotator
+				# Set a line of angles for this rotation and compute its cosines and sines once, so every trigonometric element in the transform is a simple lookup
 				thetas = np.linspace(rotation["min"], rotation["max"], rotations["segments"] + 1)
+				cosines = np.cos(thetas)
+				sines = np.sin(thetas)
+				multipliers = {
+					"cos": cosines,
+					"-cos": -cosines,
+					"sin": sines,
+					"-sin": -sines,
+				}
+
+				# Now iterate over every row and row element in the transform to build this rotator, zero elements are skipped since the rotator starts out as all zeros
 				for j, row in enumerate(rotation["transform"]):
 					for k, element in enumerate(row):
 						# Each element is assumed to be either a string or a number, handle each type appropriately
 
 						if (type(element) == str):
-							if (element == "cos"):
-								rotators[i][j, k, : ] = np.cos(thetas)
-							elif (element == "-cos"):
-								rotators[i][j, k, : ] = -np.cos(thetas)
-							elif (element == "sin"):
-								rotators[i][j, k, : ] = np.sin(thetas)
-							elif (element == "-sin"):
-								rotators[i][j, k, : ] = -np.sin(thetas)
+							if (element in multipliers):
+								rotators[i][ : , j, k] = multipliers[element]
 							else:
-								raise Exception(f"Invalid multiplier {multiplier} in transform at row {row_counter}, column {column_counter}")
-						else:
-							rotators[i][j, k, : ] = np.full(thetas.shape, np.float64(element))
-
-			# Initialize the overall rotator that will be a composit set of all rotations
-			composite_rotator = np.zeros(rotators[0].shape)
+								raise Exception(f"Invalid multiplier {element} in transform at row {j}, column {k}")
+						elif (element != 0):
+							rotators[i][ : , j, k] = element
 
 			# If a set of basis vectors have been passed into this method call and the size of the basis vector set matches that of the transforms from rotations,
 			# convert the basis vector set into an orthonormal basis to use as a projection of this hyperdimensional space to a three-dimensional subspace
@@ -201,43 +227,48 @@ class FunctionRunner:
 			if (
 				(basis_vectors is not None)
 				and (type(basis_vectors) == list)
-				and (len(basis_vectors) == composite_rotator.shape[0])
+				and (len(basis_vectors) == rotators[0].shape[1])
 				and (type(basis_vectors[0]) == list)
-				and (len(basis_vectors[0]) == composite_rotator.shape[1])
+				and (len(basis_vectors[0]) == rotators[0].shape[2])
 			):
-				orthonormal_basis, r = np.linalg.qr(np.array(basis_vectors))
+				# The QR decomposition is always done in double precision for stability and only the result is converted to the frames' dtype
+				orthonormal_basis, r = np.linalg.qr(np.array(basis_vectors, dtype=np.float64))
+				orthonormal_basis = orthonormal_basis.astype(self.dtype)
 				has_orthonormal_basis = True
 
-			# Iterate over the desired number of rotation segments (plus one to include all endpoints) as the first step toward building the full compsite rotator object
-			for i in range(rotations["segments"] + 1):
-				frame_rotator = None
-
-				# Now iterate over each rotator that has been built from the desired transforms in the incoming rotations argument and use those to build this single frame of the composite rotator
-				for j, rotator in enumerate(rotators):
-					if (j == 0):
-						frame_rotator = rotator[ : , : , i]
-					else:
-						frame_rotator = frame_rotator @ rotator[ : , : , i]
+			# Build the overall rotator that will be a composite set of all rotations, keeping the rotation segments as the first axis
+			# Each matrix product below is a single batched numpy call across every segment instead of one call per segment
+			composite_rotator = None
+			for j, rotator in enumerate(rotators):
+				if (j == 0):
+					composite_rotator = rotator
+				else:
+					composite_rotator = composite_rotator @ rotator
 
-				if (has_orthonormal_basis):
-					# An orthonormal basis has been generated from the incoming basis_vectors argument, apply it to this rotator section
-					frame_rotator = frame_rotator @ orthonormal_basis
-
-				composite_rotator[ : , : , i] = frame_rotator
+			if (has_orthonormal_basis):
+				# An orthonormal basis has been generated from the incoming basis_vectors argument, apply it to every rotator segment
+				composite_rotator = composite_rotator @ orthonormal_basis
 
 			# Initialize the object's set of animation frames before running the rotations
 			self.animation_frames = dict()
 			self.animation_frames["ranges"] = self.computed_points["ranges"]
-			self.animation_frames["frames"] = np.empty(tuple((rotations["segments"] + 1, *self.computed_points["points"].shape)))
 
-			# First, iterate over the composite rotator to apply each rotator frame to the computed points
-			for i in range(composite_rotator.shape[-1]):
+			# Apply every rotator frame to every computed point vector
+			# The computed points' grid positions are flattened into a single axis and the rotator frames are stacked on top of each other,
+			# so that all of the frames are computed by one matrix-matrix product written straight into the preallocated frames array
+			points = self.computed_points["points"].astype(self.dtype, copy=False)
+			frames = np.empty((*composite_rotator.shape[ : 2], *points.shape[1 : ]), dtype=self.dtype)
+			rotator_matrix = composite_rotator.reshape(-1, points.shape[0])
+			points_matrix = points.reshape(points.shape[0], -1)
+			frames_matrix = frames.reshape(frames.shape[0] * frames.shape[1], -1)
+
+			if (self.use_gpu):
+				# Run the product on the GPU and copy the result back into the frames array
+				cp.asnumpy(cp.matmul(cp.asarray(rotator_matrix), cp.asarray(points_matrix)), out=frames_matrix)
+			else:
+				np.matmul(rotator_matrix, points_matrix, out=frames_matrix)
 
-				# Next, iterate over the computed points' x-coordinate iterator position and y-coordinate iterator position (in that order) to get each computed point vector
-				# Then apply the current rotator frame matirx to it and save the resulting vector in its appropriate animation frame
-				for j in range(self.computed_points["points"].shape[-2]):
-					for k in range(self.computed_points["points"].shape[-1]):
-						self.animation_frames["frames"][i, : , j, k] = composite_rotator[ : , : , i] @ self.computed_points["points"][ : , j, k]
+			self.animation_frames["frames"] = frames
 
 	def write(self, object_name:str, output_file:str=None):
 		"""
@@ -250,6 +281,7 @@ class FunctionRunner:
 		output_file : str
 			Thr full path of the output file to which the data object will be written
 			If it is not included in the method call, the object's default output file path will be used
+			The points or frames array itself is saved to a numpy .npy file with the same name and location as the output file
 
 		Returns
 		-------
@@ -257,27 +289,39 @@ class FunctionRunner:
 		"""
 
 		to_be_written = None
+		array_to_be_written = None
 
 		# Make sure that a valid output file destination will be used
 		output_file = self.check_file_path(output_file)
 		if (output_file is None):
 			output_file = self.output_file
 
+		# The points and frames arrays are far too large to write efficiently as JSON text, so each is saved as a binary numpy file next to the output file
+		# and the JSON output only records the ranges and the name of that numpy file
+		array_file = output_file.with_suffix(".npy")
+
 		if (object_name == "computed_points"):
 			if (self.computed_points is not None):
-				# The computed points are being written and the object has been built, create a JSON-friendly version of the computed points
+				# The computed points are being written and the object has been built
+				array_to_be_written = self.computed_points["points"]
 				to_be_written = dict()
 				to_be_written["ranges"] = self.computed_points["ranges"]
-				to_be_written["points"] = self.computed_points["points"].tolist()
+				to_be_written["points_file"] = array_file.name
 			else:
 				raise Exception("The computed_points object is empty and cannot be written")
 				
 		elif (object_name == "animation_frames"):
 			if (self.animation_frames is not None):
-				# The animation frames are being written and the object has been built, create a JSON-friendly version of the animation frames
+				# The animation frames are being written and the object has been built
+				array_to_be_written = self.animation_frames["frames"]
 				to_be_written = dict()
 				to_be_written["ranges"] = self.animation_frames["ranges"]
-				to_be_written["frames"] = self.animation_frames["frames"].tolist()
+				to_be_written["frames_file"] = array_file.name
+
+				# Also record each point element's minimum and maximum across all frames, so that plotters reading this file do not have to scan every frame for them
+				element_axes = tuple(i for i in range(array_to_be_written.ndim) if (i != 1))
+				to_be_written["minima"] = np.min(array_to_be_written, axis=element_axes).tolist()
+				to_be_written["maxima"] = np.max(array_to_be_written, axis=element_axes).tolist()
 			else:
 				raise Exception("The animation_frames object is empty and cannot be written")
 
@@ -286,5 +330,8 @@ class FunctionRunner:
 
 		# If we have made it to this point without raising an exception, something should be ready to be written to the output file, write it out now
 		if (to_be_written is not None):
+			if (array_to_be_written is not None):
+				np.save(array_file, array_to_be_written)
+
 			with open(output_file, "w") as f:
 				json.dump(to_be_written, f, indent=4)